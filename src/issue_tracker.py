@@ -2,15 +2,293 @@
 Issue tracking system inspired by Plane and Linear.
 """
 
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Optional, List, Dict, Set
+from functools import cache
+from typing import Optional, List, Dict, Set, Tuple
 import sqlite3
 import json
+import sys
+import threading
+import time
+import weakref
 from pathlib import Path
-
-
-@dataclass
+from secrets import token_hex
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see the "fast" extra
+    orjson = None
+
+if orjson is not None:
+    def _dumps(value) -> str:
+        return orjson.dumps(value).decode()
+
+    _loads = orjson.loads
+else:
+    def _dumps(value) -> str:
+        # Same text as orjson, so stored values compare equal whichever
+        # encoder wrote them (update_issue relies on that to skip no-ops).
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+    _loads = json.loads
+
+# Stored form of an empty list; most issues have no assignees or labels.
+_EMPTY_JSON = "[]"
+
+
+def _dumps_list(values: List[str]) -> str:
+    """Encode a list column, skipping the encoder for empty lists."""
+    return _dumps(values) if values else _EMPTY_JSON
+
+
+def _now_us() -> int:
+    """Current time as integer microseconds since the epoch."""
+    return time.time_ns() // 1000
+
+
+def _to_us(value: datetime) -> int:
+    """Convert a datetime to integer microseconds since the epoch."""
+    return round(value.timestamp() * 1_000_000)
+
+
+def _from_us(value: int) -> datetime:
+    """Convert integer microseconds since the epoch to a local datetime."""
+    return datetime.fromtimestamp(value / 1_000_000)
+
+
+def _iso_to_us(value: Optional[str]) -> Optional[int]:
+    """SQL helper used when migrating ISO-8601 text timestamps."""
+    if value is None:
+        return None
+    return _to_us(datetime.fromisoformat(value))
+
+
+# Bumped whenever _migrate() gains a step; stored in PRAGMA user_version.
+_SCHEMA_VERSION = 2
+
+# Table definitions, in creation order. Timestamps are INTEGER
+# microseconds since the epoch (see _now_us / _to_us).
+_TABLES = {
+    'issues': '''(
+        id TEXT PRIMARY KEY,
+        workspace_id TEXT NOT NULL,
+        project_id TEXT NOT NULL,
+        sequence_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        type TEXT DEFAULT 'task',
+        status TEXT DEFAULT 'backlog',
+        priority TEXT DEFAULT 'medium',
+        assignees TEXT,
+        labels TEXT,
+        cycle_id TEXT,
+        module_id TEXT,
+        created_by TEXT,
+        created_at INTEGER,
+        updated_at INTEGER,
+        due_date INTEGER,
+        estimate_points INTEGER,
+        link_count INTEGER DEFAULT 0,
+        attachment_count INTEGER DEFAULT 0,
+        comment_count INTEGER DEFAULT 0
+    )''',
+    'cycles': '''(
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        status TEXT DEFAULT 'planned',
+        start_date INTEGER,
+        end_date INTEGER,
+        issues_count INTEGER DEFAULT 0,
+        completed_count INTEGER DEFAULT 0,
+        progress INTEGER DEFAULT 0
+    )''',
+    'modules': '''(
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        status TEXT DEFAULT 'planned',
+        lead TEXT,
+        members TEXT,
+        issues_count INTEGER DEFAULT 0
+    )''',
+    'comments': '''(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        issue_id TEXT NOT NULL,
+        user TEXT,
+        body TEXT,
+        created_at INTEGER,
+        FOREIGN KEY(issue_id) REFERENCES issues(id)
+    )''',
+    'issue_activity': '''(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        issue_id TEXT NOT NULL,
+        user TEXT,
+        action TEXT,
+        field TEXT,
+        old_value TEXT,
+        new_value TEXT,
+        timestamp INTEGER,
+        FOREIGN KEY(issue_id) REFERENCES issues(id)
+    )''',
+    # assignees/labels are also kept as JSON on issues for reads; these
+    # tables are what the get_issues filters look up.
+    'issue_assignees': '''(
+        issue_id TEXT NOT NULL,
+        user TEXT NOT NULL,
+        PRIMARY KEY(issue_id, user),
+        FOREIGN KEY(issue_id) REFERENCES issues(id)
+    ) WITHOUT ROWID''',
+    'issue_labels': '''(
+        issue_id TEXT NOT NULL,
+        label TEXT NOT NULL,
+        PRIMARY KEY(issue_id, label),
+        FOREIGN KEY(issue_id) REFERENCES issues(id)
+    ) WITHOUT ROWID''',
+}
+
+# Columns that held ISO-8601 text before schema version 2.
+_TIMESTAMP_COLUMNS = {
+    'issues': ('created_at', 'updated_at', 'due_date'),
+    'cycles': ('start_date', 'end_date'),
+    'comments': ('created_at',),
+    'issue_activity': ('timestamp',),
+}
+
+# Number of distinct bulk_update statement shapes kept in the LRU cache.
+_BULK_SQL_CACHE_SIZE = 32
+
+# Above this many ids bulk_update stages them in a temp table instead of
+# binding one placeholder per id (SQLite caps bound parameters).
+_BULK_TEMP_TABLE_THRESHOLD = 500
+
+# Re-run ANALYZE after this many row changes on a connection so planner
+# statistics follow the data as it grows or skews.
+_ANALYZE_INTERVAL = 10_000
+
+# List-valued issue fields and the (table, column) they are normalized into.
+_LINK_TABLES = {
+    'assignees': ('issue_assignees', 'user'),
+    'labels': ('issue_labels', 'label'),
+}
+
+# Indexes backing the get_issues filters, the cycle/module analytics and
+# comment lookups, as name -> indexed columns.
+_INDEXES = {
+    'idx_issues_project_status': 'issues(project_id, status)',
+    'idx_issues_project_priority': 'issues(project_id, priority)',
+    'idx_issues_project_seq': 'issues(project_id, sequence_id DESC)',
+    'idx_issues_cycle': 'issues(cycle_id, status)',
+    'idx_issues_module': 'issues(module_id, status)',
+    'idx_comments_issue': 'comments(issue_id, created_at)',
+    'idx_cycles_project': 'cycles(project_id)',
+    'idx_ia_user': 'issue_assignees(user)',
+    'idx_il_label': 'issue_labels(label)',
+}
+
+# Statements are built once here rather than per call; together with the
+# connection's statement cache each is compiled once per process.
+
+# Keeps issues.comment_count in step with the comments table so comment()
+# is a single INSERT.
+_SQL_CREATE_COMMENT_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_comment_ins
+    AFTER INSERT ON comments
+    BEGIN
+        UPDATE issues SET comment_count = comment_count + 1
+        WHERE id = NEW.issue_id;
+    END
+'''
+
+# The next sequence ID for the project is computed inside the INSERT
+# itself, so concurrent creates cannot both claim it.
+_SQL_INSERT_ISSUE = '''
+    INSERT INTO issues
+    (id, workspace_id, project_id, sequence_id, title, description,
+     type, priority, assignees, labels, created_at, updated_at)
+    SELECT ?, ?, ?,
+           COALESCE((SELECT MAX(sequence_id) FROM issues
+                     WHERE project_id = ?), 0) + 1,
+           ?, ?, ?, ?, ?, ?, ?, ?
+'''
+
+# Link-table statements per list field. _SQL_INSERT_LINKS selects from
+# issues so ids that do not exist are skipped.
+_SQL_DELETE_LINKS = {
+    field: f'DELETE FROM {table} WHERE issue_id = ?'
+    for field, (table, column) in _LINK_TABLES.items()
+}
+_SQL_INSERT_LINKS = {
+    field: (f'INSERT OR IGNORE INTO {table} (issue_id, {column}) '
+            f'SELECT id, ? FROM issues WHERE id = ?')
+    for field, (table, column) in _LINK_TABLES.items()
+}
+_SQL_INSERT_LINK_PAIRS = {
+    field: (f'INSERT OR IGNORE INTO {table} (issue_id, {column}) '
+            f'VALUES (?, ?)')
+    for field, (table, column) in _LINK_TABLES.items()
+}
+
+_SQL_CREATE_BULK_IDS = ('CREATE TEMP TABLE IF NOT EXISTS _bulk_ids '
+                        '(id TEXT PRIMARY KEY)')
+_SQL_INSERT_BULK_ID = 'INSERT OR IGNORE INTO _bulk_ids VALUES (?)'
+_SQL_CLEAR_BULK_IDS = 'DELETE FROM _bulk_ids'
+
+_SQL_INSERT_CYCLE = '''
+    INSERT INTO cycles
+    (id, project_id, name, start_date, end_date)
+    VALUES (?, ?, ?, ?, ?)
+'''
+_SQL_SET_CYCLE = 'UPDATE issues SET cycle_id = ? WHERE id = ?'
+
+_SQL_INSERT_MODULE = '''
+    INSERT INTO modules
+    (id, project_id, name, description)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_SET_MODULE = 'UPDATE issues SET module_id = ? WHERE id = ?'
+
+_SQL_CYCLE_ANALYTICS = '''
+    SELECT COUNT(*),
+           SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status != 'done'
+                    THEN COALESCE(estimate_points, 1) ELSE 0 END)
+    FROM issues WHERE cycle_id = ?
+'''
+
+_SQL_MODULE_STATUS_COUNTS = '''
+    SELECT status, COUNT(*) FROM issues
+    WHERE module_id = ?
+    GROUP BY status
+'''
+
+_SQL_PROJECT_VELOCITY = '''
+    SELECT AVG(completed_count) FROM cycles WHERE project_id = ?
+'''
+
+_SQL_PROJECT_DISTRIBUTION = '''
+    SELECT priority, status, COUNT(*) FROM issues
+    WHERE project_id = ?
+    GROUP BY priority, status
+'''
+
+_SQL_INSERT_COMMENT = '''
+    INSERT INTO comments (issue_id, user, body, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+
+_SQL_SELECT_COMMENTS = '''
+    SELECT id, user, body, created_at FROM comments
+    WHERE issue_id = ?
+    ORDER BY created_at
+'''
+
+
+@dataclass(slots=True)
 class Issue:
     """Represents an issue."""
     id: str
@@ -35,8 +313,24 @@ class Issue:
     attachment_count: int = 0
     comment_count: int = 0
 
-
-@dataclass
+    @staticmethod
+    def _from_row(cursor: sqlite3.Cursor, row: tuple) -> "Issue":
+        """Cursor row factory for rows selected as _ISSUE_COLUMNS."""
+        values = list(row)
+        values[_IDX_TYPE] = _intern(row[_IDX_TYPE])
+        values[_IDX_STATUS] = _intern(row[_IDX_STATUS])
+        values[_IDX_PRIORITY] = _intern(row[_IDX_PRIORITY])
+        values[_IDX_ASSIGNEES] = _loads(row[_IDX_ASSIGNEES] or "[]")
+        values[_IDX_LABELS] = _loads(row[_IDX_LABELS] or "[]")
+        values[_IDX_CREATED_AT] = _from_us(row[_IDX_CREATED_AT])
+        values[_IDX_UPDATED_AT] = _from_us(row[_IDX_UPDATED_AT])
+        due_date = row[_IDX_DUE_DATE]
+        if due_date is not None:
+            values[_IDX_DUE_DATE] = _from_us(due_date)
+        return Issue(*values)
+
+
+@dataclass(slots=True)
 class Cycle:
     """Represents a cycle (sprint-like)."""
     id: str
@@ -50,7 +344,7 @@ class Cycle:
     progress: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Module:
     """Represents a module/feature group."""
     id: str
@@ -63,6 +357,61 @@ class Module:
     issues_count: int = 0
 
 
+# issues columns in Issue field order, so a decoded row maps onto
+# Issue(*values) positionally.
+_ISSUE_COLUMNS = tuple(f.name for f in fields(Issue))
+_SQL_SELECT_ISSUES = (f'SELECT {", ".join(_ISSUE_COLUMNS)} '
+                      f'FROM issues WHERE project_id = ?')
+
+# Positions of the columns Issue._from_row decodes.
+_IDX_TYPE = _ISSUE_COLUMNS.index('type')
+_IDX_STATUS = _ISSUE_COLUMNS.index('status')
+_IDX_PRIORITY = _ISSUE_COLUMNS.index('priority')
+_IDX_ASSIGNEES = _ISSUE_COLUMNS.index('assignees')
+_IDX_LABELS = _ISSUE_COLUMNS.index('labels')
+_IDX_CREATED_AT = _ISSUE_COLUMNS.index('created_at')
+_IDX_UPDATED_AT = _ISSUE_COLUMNS.index('updated_at')
+_IDX_DUE_DATE = _ISSUE_COLUMNS.index('due_date')
+
+# get_issues filter keys and the condition each appends, in query order.
+_ISSUE_FILTERS = {
+    'status': ' AND status = ?',
+    'priority': ' AND priority = ?',
+    'assignee': (' AND id IN (SELECT issue_id FROM issue_assignees'
+                 ' WHERE user = ?)'),
+    'label': ' AND id IN (SELECT issue_id FROM issue_labels WHERE label = ?)',
+    'cycle_id': ' AND cycle_id = ?',
+}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """sys.intern() that passes NULL through.
+
+    Used for issues.type, status and priority, whose few distinct values
+    then share one str object across fetched rows.
+    """
+    return sys.intern(value) if value is not None else value
+
+
+def _comment_row(cursor: sqlite3.Cursor, row: tuple) -> sqlite3.Row:
+    """Cursor row factory for _SQL_SELECT_COMMENTS rows."""
+    return sqlite3.Row(cursor, (*row[:3], _from_us(row[3])))
+
+
+@cache
+def _select_issues_sql(filter_keys: Tuple[str, ...]) -> str:
+    """get_issues query for a combination of filters (at most 32)."""
+    return _SQL_SELECT_ISSUES + ''.join(_ISSUE_FILTERS[k] for k in filter_keys)
+
+
+def _close_connection(conn: sqlite3.Connection):
+    """Let SQLite refresh stale statistics, then close the connection."""
+    try:
+        conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+
+
 class IssueTracker:
     """Core issue tracking engine."""
 
@@ -71,131 +420,295 @@ class IssueTracker:
             db_path = Path.home() / ".blackroad" / "issues.db"
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # One long-lived connection in autocommit mode; every write goes
+        # through _transaction().
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                     check_same_thread=False)
+        # Serialises use of the shared connection: without it a write from
+        # another thread would silently join (and share the fate of)
+        # whatever transaction happens to be open, and a read would see
+        # its uncommitted rows.
+        self._lock = threading.RLock()
+        self._conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA cache_size = -65536;
+            PRAGMA busy_timeout = 5000;
+            PRAGMA foreign_keys = ON;
+            PRAGMA analysis_limit = 400;
+        ''')
+        # Closes the connection on close(), garbage collection or
+        # interpreter exit, whichever comes first.
+        self._finalizer = weakref.finalize(self, _close_connection, self._conn)
+        # Generated UPDATE statements keyed by call shape, so identical
+        # shapes reuse one SQL string (and SQLite's compiled statement).
+        self._update_sql_cache: Dict[frozenset, Tuple[str, Tuple[str, ...]]] = {}
+        self._bulk_sql_cache: OrderedDict = OrderedDict()
+        # Connection total_changes as of the last statistics refresh.
+        self._analyzed_at_changes = 0
         self._init_db()
+        self._analyzed_at_changes = self._conn.total_changes
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._finalizer()
+
+    def _maybe_analyze(self):
+        """Refresh planner statistics every _ANALYZE_INTERVAL row changes."""
+        if self._conn.in_transaction:
+            return
+        changes = self._conn.total_changes
+        if changes - self._analyzed_at_changes >= _ANALYZE_INTERVAL:
+            self._conn.execute('ANALYZE')
+            self._analyzed_at_changes = changes
+
+    @contextmanager
+    def batch(self):
+        """Group every write in the block into one transaction.
+
+        The transaction commits when the block exits and rolls back if it
+        raises, so bursts of comment()/update_issue()/add_to_cycle() calls
+        pay for a single commit.
+        """
+        with self._transaction():
+            yield self
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        """Run the enclosed statements in a single transaction.
+
+        Inside an already open transaction (e.g. batch()) the statements
+        run under a savepoint, so a failure undoes only their own work.
+        With immediate=True a new transaction takes the database write
+        lock up front rather than on its first write.
+        """
+        with self._lock:
+            c = self._conn.cursor()
+            if self._conn.in_transaction:
+                c.execute('SAVEPOINT nested')
+                try:
+                    yield c
+                except BaseException:
+                    if self._conn.in_transaction:
+                        c.execute('ROLLBACK TO nested')
+                        c.execute('RELEASE nested')
+                    raise
+                c.execute('RELEASE nested')
+                return
+            c.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            try:
+                yield c
+            except BaseException:
+                if self._conn.in_transaction:
+                    c.execute('ROLLBACK')
+                raise
+            try:
+                c.execute('COMMIT')
+            except BaseException:
+                if self._conn.in_transaction:
+                    c.execute('ROLLBACK')
+                raise
+            self._maybe_analyze()
+
+    def _update_sql(self, fields: frozenset) -> Tuple[str, Tuple[str, ...]]:
+        """Return the cached single-issue UPDATE and its column order.
+
+        The statement binds the field values, updated_at, the issue id and
+        then the field values again: it only matches when at least one
+        field actually differs, so no-op updates write nothing.
+        """
+        cached = self._update_sql_cache.get(fields)
+        if cached is None:
+            columns = tuple(sorted(fields))
+            set_clause = ', '.join([f'{k} = ?' for k in columns])
+            changed = ' OR '.join([f'{k} IS NOT ?' for k in columns])
+            cached = (f'UPDATE issues SET {set_clause}, updated_at = ? '
+                      f'WHERE id = ? AND ({changed})', columns)
+            self._update_sql_cache[fields] = cached
+        return cached
+
+    def _bulk_update_sql(self, fields: frozenset,
+                         count: Optional[int]) -> Tuple[str, Tuple[str, ...]]:
+        """Return the cached multi-issue UPDATE and its column order.
+
+        A count of None selects the ids staged in the _bulk_ids temp table.
+        """
+        key = (fields, count)
+        cached = self._bulk_sql_cache.get(key)
+        if cached is not None:
+            self._bulk_sql_cache.move_to_end(key)
+            return cached
+        columns = tuple(sorted(fields))
+        set_clause = ', '.join([f'{k} = ?' for k in columns])
+        if count is None:
+            id_source = 'SELECT id FROM _bulk_ids'
+        else:
+            id_source = ', '.join(['?'] * count)
+        cached = (f'UPDATE issues SET {set_clause} WHERE id IN ({id_source})',
+                  columns)
+        self._bulk_sql_cache[key] = cached
+        if len(self._bulk_sql_cache) > _BULK_SQL_CACHE_SIZE:
+            self._bulk_sql_cache.popitem(last=False)
+        return cached
 
     def _init_db(self):
         """Initialize SQLite database schema."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS issues (
-                id TEXT PRIMARY KEY,
-                workspace_id TEXT NOT NULL,
-                project_id TEXT NOT NULL,
-                sequence_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                type TEXT DEFAULT 'task',
-                status TEXT DEFAULT 'backlog',
-                priority TEXT DEFAULT 'medium',
-                assignees TEXT,
-                labels TEXT,
-                cycle_id TEXT,
-                module_id TEXT,
-                created_by TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                due_date TEXT,
-                estimate_points INTEGER,
-                link_count INTEGER DEFAULT 0,
-                attachment_count INTEGER DEFAULT 0,
-                comment_count INTEGER DEFAULT 0
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS cycles (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NOT NULL,
-                name TEXT NOT NULL,
-                status TEXT DEFAULT 'planned',
-                start_date TEXT,
-                end_date TEXT,
-                issues_count INTEGER DEFAULT 0,
-                completed_count INTEGER DEFAULT 0,
-                progress INTEGER DEFAULT 0
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS modules (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NOT NULL,
-                name TEXT NOT NULL,
-                description TEXT,
-                status TEXT DEFAULT 'planned',
-                lead TEXT,
-                members TEXT,
-                issues_count INTEGER DEFAULT 0
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS comments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                issue_id TEXT NOT NULL,
-                user TEXT,
-                body TEXT,
-                created_at TEXT,
-                FOREIGN KEY(issue_id) REFERENCES issues(id)
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS issue_activity (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                issue_id TEXT NOT NULL,
-                user TEXT,
-                action TEXT,
-                field TEXT,
-                old_value TEXT,
-                new_value TEXT,
-                timestamp TEXT,
-                FOREIGN KEY(issue_id) REFERENCES issues(id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        # Migrations rebuild tables that other tables reference; foreign
+        # key enforcement can only be toggled outside a transaction, so it
+        # is off for the whole schema step.
+        self._conn.execute('PRAGMA foreign_keys = OFF')
+        try:
+            changed = self._create_schema()
+        finally:
+            self._conn.execute('PRAGMA foreign_keys = ON')
+
+        # New tables and indexes need statistics before the planner can
+        # use them well; otherwise let PRAGMA optimize decide.
+        # analysis_limit keeps both cheap on large databases.
+        if changed:
+            self._conn.execute('ANALYZE')
+        self._conn.execute('PRAGMA optimize')
+
+    def _create_schema(self) -> bool:
+        """Create missing tables, indexes and triggers, then migrate.
+
+        Returns True if tables were created or migrated. The schema version
+        is read under the write lock, so concurrent openers migrate once.
+        """
+        with self._transaction(immediate=True) as c:
+            version = c.execute('PRAGMA user_version').fetchone()[0]
+            fresh = c.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'issues'"
+            ).fetchone() is None
+            for name, definition in _TABLES.items():
+                c.execute(f'CREATE TABLE IF NOT EXISTS {name} {definition}')
+
+            if not fresh and version < _SCHEMA_VERSION:
+                # Triggers referencing a rebuilt table would block its
+                # rename; they are recreated below.
+                c.execute('DROP TRIGGER IF EXISTS trg_comment_ins')
+                self._migrate(c, version)
+
+            for name, columns in _INDEXES.items():
+                c.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {columns}')
+            c.execute(_SQL_CREATE_COMMENT_TRIGGER)
+
+            c.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+        return fresh or version < _SCHEMA_VERSION
+
+    def _migrate(self, c: sqlite3.Cursor, version: int):
+        """Upgrade a database written by an older schema version."""
+        if version < 1:
+            # Populate the link tables from the JSON columns, and rewrite
+            # those in _dumps' format: update_issue compares the stored
+            # text to detect no-op updates.
+            c.execute('SELECT id, assignees, labels FROM issues')
+            encoded = []
+            for issue_id, assignees, labels in c.fetchall():
+                assignees = _loads(assignees or "[]")
+                labels = _loads(labels or "[]")
+                self._write_links(c, [issue_id], {
+                    'assignees': assignees,
+                    'labels': labels,
+                })
+                encoded.append((_dumps_list(assignees), _dumps_list(labels),
+                                issue_id))
+            c.executemany('UPDATE issues SET assignees = ?, labels = ? '
+                          'WHERE id = ?', encoded)
+        if version < 2:
+            # Timestamps moved from ISO-8601 TEXT to INTEGER microseconds.
+            self._conn.create_function('iso_to_us', 1, _iso_to_us,
+                                       deterministic=True)
+            for table, columns in _TIMESTAMP_COLUMNS.items():
+                self._rebuild_table(c, table, {
+                    column: f'iso_to_us({column})' for column in columns
+                })
+
+    def _rebuild_table(self, c: sqlite3.Cursor, table: str,
+                       converters: Dict[str, str]):
+        """Recreate a table from _TABLES, copying rows through converters.
+
+        Indexes and triggers on the table are dropped along with it and
+        recreated by _create_schema.
+        """
+        c.execute(f'PRAGMA table_info({table})')
+        columns = [row[1] for row in c.fetchall()]
+        select = ', '.join(converters.get(col, col) for col in columns)
+        c.execute(f'CREATE TABLE _{table}_new {_TABLES[table]}')
+        c.execute(f'INSERT INTO _{table}_new ({", ".join(columns)}) '
+                  f'SELECT {select} FROM {table}')
+        c.execute(f'DROP TABLE {table}')
+        c.execute(f'ALTER TABLE _{table}_new RENAME TO {table}')
+
+    def _write_links(self, c: sqlite3.Cursor, issue_ids: List[str],
+                     links: Dict[str, List[str]]):
+        """Replace the assignee/label link rows of the given issues."""
+        for name, values in links.items():
+            c.executemany(_SQL_DELETE_LINKS[name],
+                          [(issue_id,) for issue_id in issue_ids])
+            c.executemany(_SQL_INSERT_LINKS[name],
+                          [(value, issue_id) for issue_id in issue_ids
+                           for value in values])
 
     def create_issue(self, project_id: str, title: str, description: str = "",
                     issue_type: str = "task", priority: str = "medium",
                     assignees: Optional[List[str]] = None,
                     labels: Optional[List[str]] = None) -> str:
         """Create a new issue."""
-        import uuid
-        issue_id = str(uuid.uuid4())[:8]
+        issue_id = token_hex(4)
         workspace_id = "default"  # Simplified
         
         assignees = assignees or []
         labels = labels or []
 
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        # Get next sequence ID for this project
-        c.execute('SELECT MAX(sequence_id) FROM issues WHERE project_id = ?',
-                 (project_id,))
-        max_seq = c.fetchone()[0] or 0
-        sequence_id = max_seq + 1
-
-        now = datetime.now().isoformat()
-        c.execute('''
-            INSERT INTO issues
-            (id, workspace_id, project_id, sequence_id, title, description,
-             type, priority, assignees, labels, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (issue_id, workspace_id, project_id, sequence_id, title, description,
-              issue_type, priority, json.dumps(assignees), json.dumps(labels),
-              now, now))
-
-        conn.commit()
-        conn.close()
+        now = _now_us()
+        with self._transaction() as c:
+            c.execute(_SQL_INSERT_ISSUE, (
+                issue_id, workspace_id, project_id, project_id, title,
+                description, issue_type, priority, _dumps_list(assignees),
+                _dumps_list(labels), now, now))
+            self._write_links(c, [issue_id],
+                              {'assignees': assignees, 'labels': labels})
+
         return issue_id
 
+    def bulk_create_issues(self, project_id: str,
+                           issues: List[Dict]) -> List[str]:
+        """Create several issues in one transaction.
+
+        Each dict takes the keyword arguments of create_issue: title and
+        optionally description, issue_type, priority, assignees, labels.
+        """
+        workspace_id = "default"  # Simplified
+        now = _now_us()
+
+        rows = []
+        links = {name: [] for name in _LINK_TABLES}
+        for spec in issues:
+            issue_id = token_hex(4)
+            assignees = spec.get('assignees') or []
+            labels = spec.get('labels') or []
+            rows.append((
+                issue_id, workspace_id, project_id, project_id, spec['title'],
+                spec.get('description', ""), spec.get('issue_type', "task"),
+                spec.get('priority', "medium"), _dumps_list(assignees),
+                _dumps_list(labels), now, now))
+            links['assignees'].extend((issue_id, user) for user in assignees)
+            links['labels'].extend((issue_id, label) for label in labels)
+
+        with self._transaction() as c:
+            c.executemany(_SQL_INSERT_ISSUE, rows)
+            for name, pairs in links.items():
+                c.executemany(_SQL_INSERT_LINK_PAIRS[name], pairs)
+
+        return [row[0] for row in rows]
+
     def update_issue(self, issue_id: str, **kwargs) -> bool:
-        """Update an issue with flexible kwargs."""
+        """Update an issue with flexible kwargs.
+
+        Returns True only if a stored value changed.
+        """
         allowed_fields = {
             'title', 'description', 'status', 'priority', 'assignees',
             'labels', 'cycle_id', 'module_id', 'due_date', 'estimate_points'
@@ -206,77 +719,57 @@ class IssueTracker:
         if not updates:
             return False
 
-        # Convert lists to JSON
-        for field in ['assignees', 'labels']:
-            if field in updates:
-                updates[field] = json.dumps(updates[field])
-
-        updates['updated_at'] = datetime.now().isoformat()
+        # Convert lists to JSON, keeping the raw lists for the link tables
+        links = {f: updates[f] for f in _LINK_TABLES if f in updates}
+        for name, values in links.items():
+            updates[name] = _dumps_list(values)
 
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        if updates.get('due_date') is not None:
+            updates['due_date'] = _to_us(updates['due_date'])
 
-        set_clause = ', '.join([f'{k} = ?' for k in updates.keys()])
-        values = list(updates.values()) + [issue_id]
+        sql, columns = self._update_sql(frozenset(updates))
+        new_values = [updates[k] for k in columns]
+        values = new_values + [_now_us(), issue_id] + new_values
 
-        c.execute(f'UPDATE issues SET {set_clause} WHERE id = ?', values)
-        conn.commit()
-        conn.close()
-        return True
+        with self._transaction() as c:
+            c.execute(sql, values)
+            changed = c.rowcount > 0
+            # The JSON columns mirror the link tables, so unchanged
+            # lists mean the link rows are already correct.
+            if changed:
+                self._write_links(c, [issue_id], links)
+        return changed
 
     def create_cycle(self, project_id: str, name: str,
                     start_date: datetime, end_date: datetime) -> str:
         """Create a cycle."""
-        import uuid
-        cycle_id = str(uuid.uuid4())[:8]
-
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO cycles
-            (id, project_id, name, start_date, end_date)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (cycle_id, project_id, name, start_date.isoformat(),
-              end_date.isoformat()))
-        conn.commit()
-        conn.close()
+        cycle_id = token_hex(4)
+
+        with self._transaction() as c:
+            c.execute(_SQL_INSERT_CYCLE, (cycle_id, project_id, name,
+                                          _to_us(start_date), _to_us(end_date)))
         return cycle_id
 
     def add_to_cycle(self, issue_id: str, cycle_id: str) -> bool:
         """Add an issue to a cycle."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('UPDATE issues SET cycle_id = ? WHERE id = ?',
-                 (cycle_id, issue_id))
-        conn.commit()
-        conn.close()
+        with self._transaction() as c:
+            c.execute(_SQL_SET_CYCLE, (cycle_id, issue_id))
         return True
 
     def create_module(self, project_id: str, name: str,
                      description: str = "") -> str:
         """Create a module."""
-        import uuid
-        module_id = str(uuid.uuid4())[:8]
-
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO modules
-            (id, project_id, name, description)
-            VALUES (?, ?, ?, ?)
-        ''', (module_id, project_id, name, description))
-        conn.commit()
-        conn.close()
+        module_id = token_hex(4)
+
+        with self._transaction() as c:
+            c.execute(_SQL_INSERT_MODULE,
+                      (module_id, project_id, name, description))
         return module_id
 
     def add_to_module(self, issue_id: str, module_id: str) -> bool:
         """Add an issue to a module."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('UPDATE issues SET module_id = ? WHERE id = ?',
-                 (module_id, issue_id))
-        conn.commit()
-        conn.close()
+        with self._transaction() as c:
+            c.execute(_SQL_SET_MODULE, (module_id, issue_id))
         return True
 
     def bulk_update(self, issue_ids: List[str], **kwargs) -> int:
@@ -293,97 +786,55 @@ class IssueTracker:
         if not updates:
             return 0
 
-        for field in ['assignees', 'labels']:
-            if field in updates:
-                updates[field] = json.dumps(updates[field])
-
-        updates['updated_at'] = datetime.now().isoformat()
-
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        set_clause = ', '.join([f'{k} = ?' for k in updates.keys()])
-        values = list(updates.values())
-
-        placeholders = ', '.join(['?' for _ in issue_ids])
-        c.execute(f'UPDATE issues SET {set_clause} WHERE id IN ({placeholders})',
-                 values + issue_ids)
-
-        affected = c.rowcount
-        conn.commit()
-        conn.close()
+        links = {f: updates[f] for f in _LINK_TABLES if f in updates}
+        for name, values in links.items():
+            updates[name] = _dumps_list(values)
+
+        updates['updated_at'] = _now_us()
+
+        staged = len(issue_ids) > _BULK_TEMP_TABLE_THRESHOLD
+
+        with self._transaction() as c:
+            # The statement cache is shared, so it is only touched under
+            # the transaction lock.
+            sql, columns = self._bulk_update_sql(
+                frozenset(updates), None if staged else len(issue_ids))
+            values = [updates[k] for k in columns]
+            if staged:
+                c.execute(_SQL_CREATE_BULK_IDS)
+                c.executemany(_SQL_INSERT_BULK_ID,
+                              [(issue_id,) for issue_id in issue_ids])
+                c.execute(sql, values)
+                affected = c.rowcount
+                c.execute(_SQL_CLEAR_BULK_IDS)
+            else:
+                c.execute(sql, values + list(issue_ids))
+                affected = c.rowcount
+            self._write_links(c, issue_ids, links)
         return affected
 
     def get_issues(self, project_id: str, filters: Optional[Dict] = None) -> List[Issue]:
         """Get issues with optional filters."""
         filters = filters or {}
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        query = 'SELECT * FROM issues WHERE project_id = ?'
-        params = [project_id]
-
-        if 'status' in filters:
-            query += ' AND status = ?'
-            params.append(filters['status'])
-        if 'priority' in filters:
-            query += ' AND priority = ?'
-            params.append(filters['priority'])
-        if 'assignee' in filters:
-            # Note: assignees is JSON, so this is approximate
-            query += " AND assignees LIKE ?"
-            params.append(f"%{filters['assignee']}%")
-        if 'label' in filters:
-            query += " AND labels LIKE ?"
-            params.append(f"%{filters['label']}%")
-        if 'cycle_id' in filters:
-            query += ' AND cycle_id = ?'
-            params.append(filters['cycle_id'])
-
-        c.execute(query, params)
-        rows = c.fetchall()
-        conn.close()
+        c = self._conn.cursor()
+        c.row_factory = Issue._from_row
+
+        filter_keys = tuple(k for k in _ISSUE_FILTERS if k in filters)
+        params = [project_id] + [filters[k] for k in filter_keys]
 
-        issues = []
-        for row in rows:
-            issues.append(Issue(
-                id=row[0], workspace_id=row[1], project_id=row[2],
-                sequence_id=row[3], title=row[4], description=row[5],
-                type=row[6], status=row[7], priority=row[8],
-                assignees=json.loads(row[9] or "[]"),
-                labels=json.loads(row[10] or "[]"),
-                cycle_id=row[11], module_id=row[12],
-                created_by=row[13],
-                created_at=datetime.fromisoformat(row[14]),
-                updated_at=datetime.fromisoformat(row[15]),
-                due_date=datetime.fromisoformat(row[16]) if row[16] else None,
-                estimate_points=row[17],
-                link_count=row[18],
-                attachment_count=row[19],
-                comment_count=row[20]
-            ))
-        return issues
+        with self._lock:
+            c.execute(_select_issues_sql(filter_keys), params)
+            return c.fetchall()
 
     def get_cycle_analytics(self, cycle_id: str) -> Dict:
         """Get analytics for a cycle (burnup/burndown data)."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        c.execute('''
-            SELECT COUNT(*), SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END)
-            FROM issues WHERE cycle_id = ?
-        ''', (cycle_id,))
+        c = self._conn.cursor()
 
-        total, completed = c.fetchone()
+        with self._lock:
+            c.execute(_SQL_CYCLE_ANALYTICS, (cycle_id,))
+            total, completed, remaining_points = c.fetchone()
         completed = completed or 0
-
-        c.execute('''
-            SELECT SUM(CASE WHEN estimate_points IS NOT NULL THEN estimate_points ELSE 1 END)
-            FROM issues WHERE cycle_id = ? AND status != 'done'
-        ''', (cycle_id,))
-
-        remaining_points = c.fetchone()[0] or 0
-        conn.close()
+        remaining_points = remaining_points or 0
 
         return {
             "total_issues": total,
@@ -395,26 +846,18 @@ class IssueTracker:
 
     def get_module_progress(self, module_id: str) -> Dict:
         """Get progress for a module."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        c.execute('''
-            SELECT COUNT(*) FROM issues WHERE module_id = ?
-        ''', (module_id,))
-        total = c.fetchone()[0]
+        c = self._conn.cursor()
 
-        c.execute('''
-            SELECT status, COUNT(*) FROM issues
-            WHERE module_id = ?
-            GROUP BY status
-        ''', (module_id,))
+        with self._lock:
+            c.execute(_SQL_MODULE_STATUS_COUNTS, (module_id,))
+            rows = c.fetchall()
 
         by_status = {}
-        for status, count in c.fetchall():
+        for status, count in rows:
             by_status[status] = count
 
+        total = sum(by_status.values())
         completed = by_status.get('done', 0)
-        conn.close()
 
         return {
             "total": total,
@@ -424,34 +867,23 @@ class IssueTracker:
 
     def get_project_analytics(self, project_id: str) -> Dict:
         """Get high-level project analytics."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        c = self._conn.cursor()
 
-        # Velocity (average issues completed per cycle)
-        c.execute('''
-            SELECT AVG(completed_count) FROM cycles WHERE project_id = ?
-        ''', (project_id,))
-        velocity = c.fetchone()[0] or 0
+        with self._lock:
+            # Velocity (average issues completed per cycle)
+            c.execute(_SQL_PROJECT_VELOCITY, (project_id,))
+            velocity = c.fetchone()[0] or 0
 
-        # Priority distribution
-        c.execute('''
-            SELECT priority, COUNT(*) FROM issues
-            WHERE project_id = ?
-            GROUP BY priority
-        ''', (project_id,))
+            # Priority and status distributions from one pass over the
+            # project's issues, folded per (priority, status) pair
+            c.execute(_SQL_PROJECT_DISTRIBUTION, (project_id,))
+            rows = c.fetchall()
 
-        priority_dist = {p: c for p, c in c.fetchall()}
-
-        # Status distribution
-        c.execute('''
-            SELECT status, COUNT(*) FROM issues
-            WHERE project_id = ?
-            GROUP BY status
-        ''', (project_id,))
-
-        status_dist = {s: c for s, c in c.fetchall()}
-
-        conn.close()
+        priority_dist = {}
+        status_dist = {}
+        for priority, status, count in rows:
+            priority_dist[priority] = priority_dist.get(priority, 0) + count
+            status_dist[status] = status_dist.get(status, 0) + count
 
         return {
             "velocity": velocity,
@@ -461,88 +893,100 @@ class IssueTracker:
 
     def comment(self, issue_id: str, user: str, body: str) -> int:
         """Add a comment to an issue."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        c.execute('''
-            INSERT INTO comments (issue_id, user, body, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (issue_id, user, body, datetime.now().isoformat()))
-
-        # Increment comment count
-        c.execute('''
-            UPDATE issues SET comment_count = comment_count + 1
-            WHERE id = ?
-        ''', (issue_id,))
-
-        conn.commit()
-        comment_id = c.lastrowid
-        conn.close()
-        return comment_id
-
-    def get_comments(self, issue_id: str) -> List[Dict]:
-        """Get all comments for an issue."""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        c.execute('''
-            SELECT id, user, body, created_at FROM comments
-            WHERE issue_id = ?
-            ORDER BY created_at
-        ''', (issue_id,))
-
-        comments = []
-        for comment_id, user, body, created_at in c.fetchall():
-            comments.append({
-                "id": comment_id,
-                "user": user,
-                "body": body,
-                "created_at": created_at
-            })
+        # comment_count is bumped by the trg_comment_ins trigger.
+        with self._transaction() as c:
+            c.execute(_SQL_INSERT_COMMENT, (issue_id, user, body, _now_us()))
+        return c.lastrowid
 
-        conn.close()
-        return comments
+    def get_comments(self, issue_id: str) -> List[sqlite3.Row]:
+        """Get all comments for an issue.
+
+        Rows support lookup by column name (id, user, body, created_at).
+        """
+        c = self._conn.cursor()
+        c.row_factory = _comment_row
+
+        with self._lock:
+            c.execute(_SQL_SELECT_COMMENTS, (issue_id,))
+            return c.fetchall()
 
 
 # CLI interface
-if __name__ == "__main__":
-    import sys
+#
+# Each command builds only its own parser, and the tracker (and its
+# database connection) is opened after the arguments have been validated.
+
+def _cmd_issues(argv: List[str]) -> int:
     import argparse
 
-    parser = argparse.ArgumentParser(description="Issue tracking system")
-    subparsers = parser.add_subparsers(dest="command")
-
-    # issues command
-    issues_parser = subparsers.add_parser("issues")
-    issues_parser.add_argument("--project", required=True)
-    issues_parser.add_argument("--status", default=None)
-
-    # create command
-    create_parser = subparsers.add_parser("create")
-    create_parser.add_argument("project_id")
-    create_parser.add_argument("type")
-    create_parser.add_argument("title")
-    create_parser.add_argument("--priority", default="medium")
-
-    # analytics command
-    analytics_parser = subparsers.add_parser("analytics")
-    analytics_parser.add_argument("project_id")
-
-    args = parser.parse_args()
-    tracker = IssueTracker()
-
-    if args.command == "issues":
-        filters = {}
-        if args.status:
-            filters['status'] = args.status
-        issues = tracker.get_issues(args.project, filters)
-        for issue in issues:
-            print(f"[{issue.sequence_id}] {issue.title} ({issue.status})")
-    elif args.command == "create":
-        issue_id = tracker.create_issue(args.project_id, args.title,
-                                       issue_type=args.type, priority=args.priority)
-        print(f"Issue created: {issue_id}")
-    elif args.command == "analytics":
-        analytics = tracker.get_project_analytics(args.project_id)
-        print(f"Velocity: {analytics['velocity']}")
-        print(f"Status: {analytics['status_distribution']}")
+    parser = argparse.ArgumentParser(prog="issue_tracker.py issues")
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--status", default=None)
+    args = parser.parse_args(argv)
+
+    filters = {}
+    if args.status:
+        filters['status'] = args.status
+    issues = IssueTracker().get_issues(args.project, filters)
+    for issue in issues:
+        print(f"[{issue.sequence_id}] {issue.title} ({issue.status})")
+    return 0
+
+
+def _cmd_create(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="issue_tracker.py create")
+    parser.add_argument("project_id")
+    parser.add_argument("type")
+    parser.add_argument("title")
+    parser.add_argument("--priority", default="medium")
+    args = parser.parse_args(argv)
+
+    issue_id = IssueTracker().create_issue(args.project_id, args.title,
+                                           issue_type=args.type,
+                                           priority=args.priority)
+    print(f"Issue created: {issue_id}")
+    return 0
+
+
+def _cmd_analytics(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="issue_tracker.py analytics")
+    parser.add_argument("project_id")
+    args = parser.parse_args(argv)
+
+    analytics = IssueTracker().get_project_analytics(args.project_id)
+    print(f"Velocity: {analytics['velocity']}")
+    print(f"Status: {analytics['status_distribution']}")
+    return 0
+
+
+_CLI_COMMANDS = {
+    "issues": _cmd_issues,
+    "create": _cmd_create,
+    "analytics": _cmd_analytics,
+}
+
+_CLI_USAGE = (f"usage: issue_tracker.py {{{','.join(_CLI_COMMANDS)}}} ...\n"
+              "\n"
+              "Issue tracking system")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Dispatch a CLI invocation to its command handler."""
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else None
+    if cmd in ("-h", "--help"):
+        print(_CLI_USAGE)
+        return 0
+    handler = _CLI_COMMANDS.get(cmd)
+    if handler is None:
+        print(_CLI_USAGE, file=sys.stderr)
+        return 2
+    return handler(argv[1:])
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
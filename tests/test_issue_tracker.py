@@ -4,19 +4,217 @@ Run with: pytest tests/ -v
 """
 
 import pytest
+import sqlite3
+import threading
 import sys
 import os
+from dataclasses import fields
 from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from issue_tracker import IssueTracker
+import issue_tracker
+from issue_tracker import Issue, IssueTracker, main, _ISSUE_COLUMNS
 
 
 @pytest.fixture
 def tracker(tmp_path):
     db = tmp_path / "test.db"
-    return IssueTracker(db_path=str(db))
+    t = IssueTracker(db_path=str(db))
+    yield t
+    t.close()
+
+
+def _write_legacy_db(db):
+    """Write a database in the original, unversioned schema."""
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "CREATE TABLE issues (id TEXT PRIMARY KEY, workspace_id TEXT, "
+        "project_id TEXT, sequence_id INTEGER, title TEXT, "
+        "description TEXT, type TEXT, status TEXT, priority TEXT, "
+        "assignees TEXT, labels TEXT, cycle_id TEXT, module_id TEXT, "
+        "created_by TEXT, created_at TEXT, updated_at TEXT, "
+        "due_date TEXT, estimate_points INTEGER, link_count INTEGER, "
+        "attachment_count INTEGER, comment_count INTEGER)"
+    )
+    conn.execute(
+        "INSERT INTO issues VALUES ('abc', 'default', 'proj-1', 1, 'Old', "
+        "'', 'task', 'backlog', 'medium', '[\"alice\"]', "
+        "'[\"ui\", \"backend\"]', "
+        "NULL, NULL, '', '2024-01-01T09:00:00', '2024-01-01T09:00:00', "
+        "NULL, NULL, 0, 0, 0)"
+    )
+    conn.execute(
+        "CREATE TABLE comments (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "issue_id TEXT NOT NULL, user TEXT, body TEXT, created_at TEXT, "
+        "FOREIGN KEY(issue_id) REFERENCES issues(id))"
+    )
+    conn.execute(
+        "INSERT INTO comments (issue_id, user, body, created_at) "
+        "VALUES ('abc', 'bob', 'Old note', '2024-01-02T10:30:00')"
+    )
+    conn.commit()
+    conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+class TestStorage:
+    def test_wal_journal_mode(self, tracker):
+        mode = tracker._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_reopen_sees_committed_data(self, tmp_path):
+        db = str(tmp_path / "reopen.db")
+        first = IssueTracker(db_path=db)
+        issue_id = first.create_issue("proj-1", "Persisted")
+        first.close()
+        second = IssueTracker(db_path=db)
+        issues = second.get_issues("proj-1")
+        second.close()
+        assert [i.id for i in issues] == [issue_id]
+
+    def test_legacy_database_backfills_links(self, tmp_path):
+        db = str(tmp_path / "legacy.db")
+        _write_legacy_db(db)
+        tracker = IssueTracker(db_path=db)
+        by_assignee = tracker.get_issues("proj-1", {"assignee": "alice"})
+        by_label = tracker.get_issues("proj-1", {"label": "ui"})
+        comments = tracker.get_comments("abc")
+        tracker.close()
+        assert [i.id for i in by_assignee] == ["abc"]
+        assert [i.id for i in by_label] == ["abc"]
+        assert by_assignee[0].created_at == datetime(2024, 1, 1, 9, 0)
+        assert comments[0]["created_at"] == datetime(2024, 1, 2, 10, 30)
+
+    def test_legacy_lists_unchanged_update_is_noop(self, tmp_path):
+        db = str(tmp_path / "legacy.db")
+        _write_legacy_db(db)
+        tracker = IssueTracker(db_path=db)
+        changed = tracker.update_issue("abc", assignees=["alice"],
+                                       labels=["ui", "backend"])
+        issue = tracker.get_issues("proj-1")[0]
+        tracker.close()
+        assert changed is False
+        assert issue.updated_at == datetime(2024, 1, 1, 9, 0)
+
+    def test_concurrent_open_migrates_once(self, tmp_path):
+        db = str(tmp_path / "legacy.db")
+        _write_legacy_db(db)
+        errors = []
+
+        def open_tracker():
+            try:
+                IssueTracker(db_path=db).close()
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=open_tracker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        tracker = IssueTracker(db_path=db)
+        issues = tracker.get_issues("proj-1")
+        tracker.close()
+        assert issues[0].created_at == datetime(2024, 1, 1, 9, 0)
+
+    def test_issue_row_maps_each_field(self):
+        raw = {name: f"<{name}>" for name in _ISSUE_COLUMNS}
+        raw.update(assignees='["alice"]', labels='["ui"]',
+                   created_at=1_000_000, updated_at=2_000_000,
+                   due_date=3_000_000)
+        issue = Issue._from_row(None, tuple(raw[n] for n in _ISSUE_COLUMNS))
+        expected = dict(raw, assignees=["alice"], labels=["ui"],
+                        created_at=datetime.fromtimestamp(1),
+                        updated_at=datetime.fromtimestamp(2),
+                        due_date=datetime.fromtimestamp(3))
+        for f in fields(Issue):
+            assert getattr(issue, f.name) == expected[f.name], f.name
+
+    def test_batch_commits_on_exit(self, tracker):
+        with tracker.batch():
+            issue_id = tracker.create_issue("proj-1", "A")
+            tracker.update_issue(issue_id, status="done")
+            tracker.comment(issue_id, "alice", "Done")
+            assert tracker._conn.in_transaction
+        assert not tracker._conn.in_transaction
+        issues = tracker.get_issues("proj-1")
+        assert issues[0].status == "done"
+        assert issues[0].comment_count == 1
+
+    def test_batch_rolls_back_on_error(self, tracker):
+        with pytest.raises(RuntimeError):
+            with tracker.batch():
+                tracker.create_issue("proj-1", "A")
+                raise RuntimeError("boom")
+        assert tracker.get_issues("proj-1") == []
+
+    def test_failed_write_in_batch_rolls_back_alone(self, tracker, monkeypatch):
+        ids = tracker.bulk_create_issues(
+            "proj-1", [{"title": f"Issue {i}"} for i in range(1200)])
+
+        def fail(*args):
+            raise RuntimeError("boom")
+
+        with tracker.batch():
+            kept = tracker.create_issue("proj-2", "Kept")
+            with monkeypatch.context() as m:
+                m.setattr(tracker, "_write_links", fail)
+                with pytest.raises(RuntimeError):
+                    tracker.bulk_update(ids[:601], status="done")
+            # The staged ids of the failed update must not leak into this one
+            assert tracker.bulk_update(ids[601:], status="todo") == 599
+        assert [i.id for i in tracker.get_issues("proj-2")] == [kept]
+        assert tracker.get_issues("proj-1", {"status": "done"}) == []
+
+    def test_other_threads_wait_for_batch(self, tracker):
+        worker = threading.Thread(
+            target=tracker.create_issue, args=("proj-1", "Other thread"))
+        with pytest.raises(RuntimeError):
+            with tracker.batch():
+                tracker.create_issue("proj-1", "Rolled back")
+                worker.start()
+                worker.join(timeout=0.2)
+                raise RuntimeError("boom")
+        worker.join()
+        titles = [i.title for i in tracker.get_issues("proj-1")]
+        assert titles == ["Other thread"]
+
+    def test_other_threads_do_not_read_open_batch(self, tracker):
+        seen = []
+        reader = threading.Thread(
+            target=lambda: seen.extend(tracker.get_issues("proj-1")))
+        with pytest.raises(RuntimeError):
+            with tracker.batch():
+                tracker.create_issue("proj-1", "Uncommitted")
+                reader.start()
+                reader.join(timeout=0.2)
+                raise RuntimeError("boom")
+        reader.join()
+        assert seen == []
+
+    def test_close_is_idempotent(self, tmp_path):
+        tracker = IssueTracker(db_path=str(tmp_path / "close.db"))
+        tracker.close()
+        tracker.close()
+
+    def test_periodic_analyze(self, tracker, monkeypatch):
+        monkeypatch.setattr(issue_tracker, "_ANALYZE_INTERVAL", 5)
+        start = tracker._analyzed_at_changes
+        for i in range(6):
+            tracker.create_issue("proj-1", f"Issue {i}")
+        assert tracker._analyzed_at_changes > start
+
+    def test_status_filter_uses_index(self, tracker):
+        plan = tracker._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM issues "
+            "WHERE project_id = ? AND status = ?", ("proj-1", "done")
+        ).fetchall()
+        assert any("idx_issues_project_status" in row[-1] for row in plan)
 
 
 # ---------------------------------------------------------------------------
@@ -53,6 +251,31 @@ class TestIssues:
         assert issues[0].assignees == ["alice"]
         assert issues[0].labels == ["browser"]
 
+    def test_issue_fields_decoded(self, tracker):
+        tracker.create_issue("proj-1", "Task", labels=["a", "b"])
+        issue = tracker.get_issues("proj-1")[0]
+        assert issue.labels == ["a", "b"]
+        assert isinstance(issue.created_at, datetime)
+        assert issue.due_date is None
+        assert not hasattr(issue, "__dict__")
+
+    def test_missing_json_lists_decode_empty(self, tracker):
+        issue_id = tracker.create_issue("proj-1", "Task")
+        tracker._conn.execute(
+            "UPDATE issues SET assignees = NULL, labels = '' WHERE id = ?",
+            (issue_id,))
+        issue = tracker.get_issues("proj-1")[0]
+        assert issue.assignees == []
+        assert issue.labels == []
+
+    def test_enum_fields_share_objects(self, tracker):
+        tracker.create_issue("proj-1", "A")
+        tracker.create_issue("proj-1", "B")
+        a, b = tracker.get_issues("proj-1")
+        assert a.status is b.status
+        assert a.priority is b.priority
+        assert a.type is b.type
+
     def test_sequence_ids_are_per_project(self, tracker):
         tracker.create_issue("proj-1", "A")
         tracker.create_issue("proj-1", "B")
@@ -71,18 +294,73 @@ class TestIssues:
         assert issues[0].title == "New title"
         assert issues[0].status == "in_progress"
 
+    def test_update_issue_kwarg_order_independent(self, tracker):
+        id1 = tracker.create_issue("proj-1", "A")
+        id2 = tracker.create_issue("proj-1", "B")
+        tracker.update_issue(id1, title="A2", status="done")
+        tracker.update_issue(id2, status="todo", title="B2")
+        by_id = {i.id: i for i in tracker.get_issues("proj-1")}
+        assert (by_id[id1].title, by_id[id1].status) == ("A2", "done")
+        assert (by_id[id2].title, by_id[id2].status) == ("B2", "todo")
+
+    def test_update_issue_due_date_roundtrip(self, tracker):
+        issue_id = tracker.create_issue("proj-1", "Task")
+        due = datetime(2025, 3, 14, 15, 9, 26, 535897)
+        tracker.update_issue(issue_id, due_date=due)
+        assert tracker.get_issues("proj-1")[0].due_date == due
+
+    def test_update_issue_unchanged_is_noop(self, tracker):
+        issue_id = tracker.create_issue("proj-1", "Task", labels=["ui"])
+        before = tracker.get_issues("proj-1")[0].updated_at
+        assert tracker.update_issue(issue_id, title="Task", labels=["ui"]) is False
+        assert tracker.get_issues("proj-1")[0].updated_at == before
+        assert tracker.update_issue(issue_id, title="Task", status="done") is True
+
+    def test_json_encoding_is_compact(self):
+        assert issue_tracker._dumps(["a", "é"]) == '["a","é"]'
+
+    def test_update_issue_missing_id(self, tracker):
+        assert tracker.update_issue("missing", title="X") is False
+
     def test_update_issue_invalid_field_ignored(self, tracker):
         issue_id = tracker.create_issue("proj-1", "Task")
         result = tracker.update_issue(issue_id, nonexistent_field="x")
         assert result is False
 
     def test_bulk_update(self, tracker):
-        ids = [tracker.create_issue("proj-1", f"Issue {i}") for i in range(3)]
+        with tracker.batch():
+            ids = [tracker.create_issue("proj-1", f"Issue {i}")
+                   for i in range(3)]
         affected = tracker.bulk_update(ids, status="in_progress")
         assert affected == 3
         issues = tracker.get_issues("proj-1", {"status": "in_progress"})
         assert len(issues) == 3
 
+    def test_bulk_update_large_batch(self, tracker):
+        ids = tracker.bulk_create_issues(
+            "proj-1", [{"title": f"Issue {i}"} for i in range(1200)])
+        affected = tracker.bulk_update(ids, status="done", labels=["bulk"])
+        assert affected == 1200
+        done = tracker.get_issues("proj-1", {"status": "done"})
+        assert len(done) == 1200
+        assert len(tracker.get_issues("proj-1", {"label": "bulk"})) == 1200
+
+    def test_bulk_create_issues(self, tracker):
+        tracker.create_issue("proj-1", "Existing")
+        ids = tracker.bulk_create_issues("proj-1", [
+            {"title": "A", "issue_type": "bug", "assignees": ["alice"]},
+            {"title": "B", "priority": "high", "labels": ["ui"]},
+        ])
+        assert len(ids) == 2
+        by_id = {i.id: i for i in tracker.get_issues("proj-1")}
+        assert sorted(i.sequence_id for i in by_id.values()) == [1, 2, 3]
+        assert by_id[ids[0]].type == "bug"
+        assert by_id[ids[1]].priority == "high"
+        assert [i.id for i in tracker.get_issues(
+            "proj-1", {"assignee": "alice"})] == [ids[0]]
+        assert [i.id for i in tracker.get_issues(
+            "proj-1", {"label": "ui"})] == [ids[1]]
+
     def test_bulk_update_empty_list(self, tracker):
         assert tracker.bulk_update([], status="done") == 0
 
@@ -114,6 +392,22 @@ class TestIssues:
         assert len(alice_issues) == 1
         assert alice_issues[0].assignees == ["alice"]
 
+    def test_get_issues_filter_assignee_exact_match(self, tracker):
+        tracker.create_issue("proj-1", "A", assignees=["alice"])
+        assert tracker.get_issues("proj-1", {"assignee": "ali"}) == []
+
+    def test_update_issue_replaces_labels(self, tracker):
+        issue_id = tracker.create_issue("proj-1", "A", labels=["backend"])
+        tracker.update_issue(issue_id, labels=["frontend"])
+        assert tracker.get_issues("proj-1", {"label": "backend"}) == []
+        assert len(tracker.get_issues("proj-1", {"label": "frontend"})) == 1
+
+    def test_bulk_update_assignees(self, tracker):
+        ids = [tracker.create_issue("proj-1", f"Issue {i}") for i in range(2)]
+        tracker.bulk_update(ids + ["missing"], assignees=["carol"])
+        carol = tracker.get_issues("proj-1", {"assignee": "carol"})
+        assert sorted(i.id for i in carol) == sorted(ids)
+
 
 # ---------------------------------------------------------------------------
 # Cycles
@@ -167,6 +461,19 @@ class TestCycles:
         assert analytics["completed"] == 1
         assert analytics["progress_pct"] == 50
 
+    def test_cycle_analytics_remaining_points(self, tracker):
+        cycle_id = tracker.create_cycle(
+            "proj-1", "Sprint 1",
+            datetime.now(), datetime.now() + timedelta(days=14),
+        )
+        id1 = tracker.create_issue("proj-1", "A")
+        id2 = tracker.create_issue("proj-1", "B")
+        tracker.update_issue(id1, cycle_id=cycle_id, estimate_points=3)
+        tracker.update_issue(id2, cycle_id=cycle_id, estimate_points=5,
+                             status="done")
+        analytics = tracker.get_cycle_analytics(cycle_id)
+        assert analytics["remaining_points"] == 3
+
 
 # ---------------------------------------------------------------------------
 # Modules
@@ -219,8 +526,9 @@ class TestComments:
 
     def test_multiple_comments_ordered(self, tracker):
         issue_id = tracker.create_issue("proj-1", "Bug A")
-        tracker.comment(issue_id, "alice", "First")
-        tracker.comment(issue_id, "bob", "Second")
+        with tracker.batch():
+            tracker.comment(issue_id, "alice", "First")
+            tracker.comment(issue_id, "bob", "Second")
         comments = tracker.get_comments(issue_id)
         assert len(comments) == 2
         assert comments[0]["user"] == "alice"
@@ -255,3 +563,25 @@ class TestAnalytics:
         dist = analytics["status_distribution"]
         assert dist.get("done") == 1
         assert dist.get("backlog") == 1
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+class TestCLI:
+    def test_help(self, capsys):
+        assert main(["--help"]) == 0
+        out = capsys.readouterr().out
+        assert "{issues,create,analytics}" in out
+        assert "Issue tracking system" in out
+
+    def test_unknown_command(self, capsys):
+        assert main(["bogus"]) == 2
+
+    def test_create_then_list(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        assert main(["create", "proj-1", "bug", "Crash on start"]) == 0
+        assert main(["issues", "--project", "proj-1"]) == 0
+        out = capsys.readouterr().out
+        assert "[1] Crash on start (backlog)" in out